@@ -4,15 +4,19 @@
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
 import datetime as dt
+import http.client
 import json
 import os
 import pathlib
+import random
+import re
+import threading
 import time
-import subprocess
 import sys
 import urllib.parse
-from typing import Dict, Tuple
+from typing import Dict, NamedTuple, Tuple
 
 UPSTREAM_OWNER = "kyle-seongwoo-jun"
 UPSTREAM_REPO = "apple-device-identifiers"
@@ -26,6 +30,8 @@ FILES = {
     "visionos": "visionos-device-identifiers.json",
 }
 
+KIND_BY_FILE = {file_name: kind for kind, file_name in FILES.items()}
+
 MIN_COUNTS = {
     "ios": 100,
     "macos": 50,
@@ -37,9 +43,57 @@ MIN_COUNTS = {
 ROOT = pathlib.Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT / "data"
 UPSTREAM_META_PATH = DATA_DIR / "UPSTREAM.json"
+API_CACHE_PATH = (
+    pathlib.Path(os.getenv("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache") / "device-parser" / "github-etags.json"
+)
 LICENSE_PATH = DATA_DIR / "LICENSE.apple-device-identifiers.txt"
 SYNC_REPORT_PATH = ROOT / "sync-report.md"
 
+DOWNLOAD_WORKERS = 5
+
+USER_AGENT = "device-parser-sync-script"
+CONNECT_TIMEOUT = 15
+READ_TIMEOUT = 45
+MAX_REDIRECTS = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+RATE_LIMIT_MAX_WAIT = 600.0
+
+GRAPHQL_RESOLVE_QUERY = """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) {
+    latestRelease { tagName tagCommit { oid } }
+    refs(refPrefix: "refs/tags/", first: 1, orderBy: {field: TAG_COMMIT_DATE, direction: DESC}) {
+      nodes { name target { oid ... on Tag { target { oid } } } }
+    }
+    defaultBranchRef { name target { oid } }
+  }
+}
+"""
+
+# 允许直接拼进 URL 的 ref 字符集；超出范围的 ref 视为可疑直接拒绝
+_SAFE_REF = re.compile(r"^[A-Za-z0-9._/-]+$")
+
+# GitHub API 条件请求缓存：path -> (etag, 精简后的响应)；304 不计入 rate limit
+_API_CACHE: Dict[str, Tuple[str, object]] = {}
+_API_CACHE_USED: set[str] = set()
+
+# 每个线程按 host 复用 keep-alive 连接，避免每次请求重新握手
+_CONNECTIONS = threading.local()
+
+
+class Response(NamedTuple):
+    status: int
+    headers: http.client.HTTPMessage
+    body: bytes
+
+
+class HTTPStatusError(RuntimeError):
+    def __init__(self, url: str, status: int, headers: http.client.HTTPMessage) -> None:
+        super().__init__(f"HTTP {status}: {url}")
+        self.status = status
+        self.headers = headers
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Sync apple-device-identifiers data")
@@ -49,17 +103,112 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def github_api(path: str, token: str) -> dict:
+def github_api(path: str, token: str, cache_fields: Tuple[str, ...] = ()) -> dict:
+    """调用 REST API；指定 cache_fields 时按 ETag 缓存响应中的这些字段。"""
     url = f"https://api.github.com{path}"
-    headers = [
-        "Accept: application/vnd.github+json",
-        "User-Agent: device-parser-sync-script",
-    ]
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "User-Agent": USER_AGENT,
+    }
     if token:
-        headers.append("Authorization: Bearer " + token)
+        headers["Authorization"] = "Bearer " + token
+
+    cached = _API_CACHE.get(path) if cache_fields else None
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+
+    resp = request_with_retry(url, headers)
+    if resp.status == 304 and cached is not None:
+        _API_CACHE_USED.add(path)
+        return cached[1]
+
+    data = json.loads(resp.body.decode("utf-8"))
+    etag = resp.headers.get("ETag", "")
+    if cache_fields and etag:
+        _API_CACHE[path] = (etag, pick_fields(data, cache_fields))
+        _API_CACHE_USED.add(path)
+    return data
+
+
+def pick_fields(data: object, fields: Tuple[str, ...]) -> object:
+    # 只缓存调用方会读取的字段，避免把 commit patch 之类的大字段写进缓存
+    if isinstance(data, list):
+        return [pick_fields(item, fields) for item in data]
+    if isinstance(data, dict):
+        return {key: data[key] for key in fields if key in data}
+    return data
+
+
+def graphql_resolve(token: str) -> Tuple[str, str, str]:
+    """一次 GraphQL 查询拿到 latest release、最新 tag 和默认分支的 commit。"""
+    payload = json.dumps({
+        "query": GRAPHQL_RESOLVE_QUERY,
+        "variables": {"owner": UPSTREAM_OWNER, "name": UPSTREAM_REPO},
+    }).encode("utf-8")
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": "Bearer " + token,
+        "Content-Type": "application/json",
+        "User-Agent": USER_AGENT,
+    }
+    resp = request_with_retry("https://api.github.com/graphql", headers, method="POST", body=payload)
+    try:
+        result = json.loads(resp.body)
+    except ValueError as exc:
+        raise RuntimeError(f"GraphQL 响应不是合法 JSON: {exc}") from exc
+    if not isinstance(result, dict):
+        raise RuntimeError("GraphQL 响应格式错误：期望 object")
+    if result.get("errors"):
+        raise RuntimeError(f"GraphQL 查询失败: {result['errors']}")
+    repo = (result.get("data") or {}).get("repository")
+    if not repo:
+        raise RuntimeError("GraphQL 查询失败：repository 为空")
 
-    raw = request_with_retry(url, headers)
-    return json.loads(raw.decode("utf-8"))
+    # 1) 优先 latest release
+    release = repo.get("latestRelease") or {}
+    tag = str(release.get("tagName") or "").strip()
+    sha = str((release.get("tagCommit") or {}).get("oid") or "").strip()
+    if tag and sha:
+        return tag, "tag", sha
+
+    # 2) fallback: 最新 tag（annotated tag 需要再解一层 target）
+    for node in (repo.get("refs") or {}).get("nodes") or []:
+        target = node.get("target") or {}
+        tag = str(node.get("name") or "").strip()
+        sha = str((target.get("target") or target).get("oid") or "").strip()
+        if tag and sha:
+            return tag, "tag", sha
+
+    # 3) fallback: 默认分支
+    branch = repo.get("defaultBranchRef") or {}
+    name = str(branch.get("name") or "main").strip()
+    sha = str((branch.get("target") or {}).get("oid") or "").strip()
+    if not sha:
+        raise RuntimeError("GraphQL 查询失败：无法解析默认分支 commit")
+    return name, "ref", sha
+
+
+def load_api_cache() -> None:
+    try:
+        raw = json.loads(API_CACHE_PATH.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return
+    if not isinstance(raw, dict):
+        return
+    for path, entry in raw.items():
+        if isinstance(entry, list) and len(entry) == 2 and isinstance(entry[0], str):
+            _API_CACHE[path] = (entry[0], entry[1])
+
+
+def save_api_cache() -> None:
+    # 只保留本次用到的条目，避免历史 tag 的缓存无限增长；没有用到 REST 时不落盘
+    entries = {path: list(_API_CACHE[path]) for path in _API_CACHE_USED if path in _API_CACHE}
+    if not entries:
+        return
+    try:
+        write_json(API_CACHE_PATH, entries)
+    except OSError as exc:
+        print(f"写入 ETag 缓存失败: {exc}", file=sys.stderr)
 
 
 def resolve_upstream_ref(args: argparse.Namespace, token: str) -> Tuple[str, str, str]:
@@ -67,6 +216,7 @@ def resolve_upstream_ref(args: argparse.Namespace, token: str) -> Tuple[str, str
         sha = args.sha.strip()
         if not sha:
             raise ValueError("--sha 不能为空")
+        validate_ref(sha)
         return sha, "sha", sha
 
     if args.tag:
@@ -83,9 +233,16 @@ def resolve_upstream_ref(args: argparse.Namespace, token: str) -> Tuple[str, str
         sha = resolve_commit_for_ref(ref, token)
         return ref, "ref", sha
 
+    # GraphQL 需要 token；一次查询代替下面 2~3 次 REST 调用
+    if token:
+        try:
+            return graphql_resolve(token)
+        except RuntimeError as exc:
+            print(f"GraphQL 解析 upstream ref 失败，改用 REST: {exc}", file=sys.stderr)
+
     # 1) 优先 latest release
     try:
-        latest = github_api(f"/repos/{UPSTREAM_FULL}/releases/latest", token)
+        latest = github_api(f"/repos/{UPSTREAM_FULL}/releases/latest", token, ("tag_name",))
         tag = str(latest.get("tag_name", "")).strip()
         if tag:
             sha = resolve_commit_for_ref(tag, token)
@@ -96,7 +253,7 @@ def resolve_upstream_ref(args: argparse.Namespace, token: str) -> Tuple[str, str
 
     # 2) fallback: tags 列表第一个
     try:
-        tags = github_api(f"/repos/{UPSTREAM_FULL}/tags?per_page=1", token)
+        tags = github_api(f"/repos/{UPSTREAM_FULL}/tags?per_page=1", token, ("name",))
         if isinstance(tags, list) and tags:
             tag = str(tags[0].get("name", "")).strip()
             if tag:
@@ -111,59 +268,180 @@ def resolve_upstream_ref(args: argparse.Namespace, token: str) -> Tuple[str, str
     return "main", "ref", sha
 
 
+def validate_ref(ref: str) -> str:
+    if not _SAFE_REF.match(ref) or ".." in ref:
+        raise ValueError(f"非法的 upstream ref: {ref!r}")
+    return ref
+
+
 def resolve_commit_for_ref(ref: str, token: str) -> str:
-    safe_ref = urllib.parse.quote(ref, safe="")
-    data = github_api(f"/repos/{UPSTREAM_FULL}/commits/{safe_ref}", token)
+    safe_ref = validate_ref(ref)
+    data = github_api(f"/repos/{UPSTREAM_FULL}/commits/{safe_ref}", token, ("sha",))
     sha = str(data.get("sha", "")).strip()
     if not sha:
         raise RuntimeError(f"无法解析 ref={ref} 的 commit sha")
     return sha
 
 
-def download_raw(ref: str, path: str) -> bytes:
-    safe_ref = urllib.parse.quote(ref, safe="")
+def list_upstream_blobs(sha: str, token: str) -> Dict[str, str]:
+    """一次 contents API 请求拿到仓库根目录各文件的 git blob sha，失败时返回空。"""
+    try:
+        entries = github_api(f"/repos/{UPSTREAM_FULL}/contents?ref={sha}", token)
+    except RuntimeError as exc:
+        print(f"获取 upstream 文件列表失败，将下载全部文件: {exc}", file=sys.stderr)
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    wanted = {*FILES.values(), "LICENSE"}
+    return {
+        str(entry["name"]): str(entry["sha"])
+        for entry in entries
+        if isinstance(entry, dict) and entry.get("name") in wanted and entry.get("sha")
+    }
+
+
+def download_raw(ref: str, path: str, etag: str = "") -> Tuple[bytes | None, str]:
+    """下载 raw 文件；带 etag 时发条件请求，304 返回 (None, etag)。"""
+    safe_ref = validate_ref(ref)
     url = f"https://raw.githubusercontent.com/{UPSTREAM_FULL}/{safe_ref}/{path}"
-    return request_with_retry(url, ["User-Agent: device-parser-sync-script"])
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
 
+    resp = request_with_retry(url, headers)
+    if resp.status == 304:
+        return None, etag
+    return resp.body, resp.headers.get("ETag", "")
 
-def request_with_retry(url: str, headers: list[str], retries: int = 4) -> bytes:
-    delay = 1.0
-    last_err: Exception | None = None
 
-    curl_args = [
-        "curl",
-        "--silent",
-        "--show-error",
-        "--fail",
-        "--location",
-        "--connect-timeout",
-        "15",
-        "--max-time",
-        "45",
-    ]
+FetchResult = Tuple[Dict[str, str] | bytes | None, str]
+
+
+def fetch_upstream(ref: str, path: str, etag: str) -> FetchResult:
+    """下载单个文件；映射文件直接在工作线程里校验，与其余文件的下载重叠。"""
+    blob, etag = download_raw(ref, path, etag)
+    kind = KIND_BY_FILE.get(path)
+    if blob is None or kind is None:
+        return blob, etag
+    return validate_mapping(blob, kind), etag
+
 
-    header_args: list[str] = []
-    for header in headers:
-        header_args.extend(["-H", header])
+def download_all(ref: str, paths: list[str], etags: Dict[str, str]) -> Dict[str, FetchResult]:
+    """并发下载并校验同一 ref 下的多个文件，返回 path -> (映射或原始内容, etag)。"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        futures = {path: pool.submit(fetch_upstream, ref, path, etags.get(path, "")) for path in paths}
+        return {path: future.result() for path, future in futures.items()}
+
+
+def request_with_retry(
+    url: str,
+    headers: Dict[str, str],
+    retries: int = 4,
+    method: str = "GET",
+    body: bytes | None = None,
+) -> Response:
+    last_err: Exception | None = None
 
     for attempt in range(retries):
+        wait: float | None = None
         try:
-            completed = subprocess.run(
-                [*curl_args, *header_args, url],
-                check=True,
-                capture_output=True,
-            )
-            return completed.stdout
+            return http_request(url, headers, method, body)
+        except HTTPStatusError as exc:
+            # 401/404 重试也不会成功，直接失败
+            if exc.status in (401, 404):
+                raise RuntimeError(f"请求失败: {url}: {exc}") from exc
+            last_err = exc
+            wait = rate_limit_wait(exc)
         except Exception as exc:  # noqa: BLE001
             last_err = exc
-            if attempt == retries - 1:
-                break
-            time.sleep(delay)
-            delay = min(delay * 2, 8)
+        if attempt == retries - 1:
+            break
+        if wait is None:
+            # full jitter 指数退避，避免多个 fork 同时同步时集中重试
+            wait = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))
+        time.sleep(wait)
 
     raise RuntimeError(f"请求失败: {url}: {last_err}") from last_err
 
 
+def rate_limit_wait(exc: HTTPStatusError) -> float | None:
+    """命中 GitHub rate limit 时返回需要等待的秒数，否则返回 None。"""
+    if exc.status not in (403, 429):
+        return None
+
+    retry_after = exc.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        wait = float(retry_after)
+    elif exc.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            reset = float(exc.headers.get("X-RateLimit-Reset", ""))
+        except ValueError:
+            return None
+        wait = max(reset - time.time(), 0.0) + 1.0
+    else:
+        return None
+
+    if wait > RATE_LIMIT_MAX_WAIT:
+        raise RuntimeError(f"GitHub rate limit 将在 {int(wait)} 秒后重置，放弃等待: {exc}") from exc
+    return wait
+
+
+def http_request(url: str, headers: Dict[str, str], method: str = "GET", body: bytes | None = None) -> Response:
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        conn = get_connection(parts.netloc)
+        try:
+            conn.request(method, target, body=body, headers=headers)
+            if conn.sock is not None:
+                conn.sock.settimeout(READ_TIMEOUT)
+            resp = conn.getresponse()
+            content = resp.read()
+        except Exception:
+            drop_connection(parts.netloc)
+            raise
+
+        location = resp.getheader("Location")
+        if resp.status in (301, 302, 303, 307, 308) and location:
+            next_url = urllib.parse.urljoin(url, location)
+            # 与 curl --location 一致：跨 host 时不转发 token
+            if urllib.parse.urlsplit(next_url).netloc != parts.netloc:
+                headers = {k: v for k, v in headers.items() if k.lower() != "authorization"}
+            # 303，以及 POST 后的 301/302，按惯例改为不带 body 的 GET
+            if resp.status == 303 or (resp.status in (301, 302) and method == "POST"):
+                method, body = "GET", None
+                headers = {k: v for k, v in headers.items() if k.lower() != "content-type"}
+            url = next_url
+            continue
+        if resp.status >= 400:
+            raise HTTPStatusError(url, resp.status, resp.headers)
+        return Response(resp.status, resp.headers, content)
+
+    raise RuntimeError(f"重定向次数过多: {url}")
+
+
+def get_connection(host: str) -> http.client.HTTPSConnection:
+    pool: Dict[str, http.client.HTTPSConnection] | None = getattr(_CONNECTIONS, "pool", None)
+    if pool is None:
+        pool = _CONNECTIONS.pool = {}
+    conn = pool.get(host)
+    if conn is None:
+        conn = http.client.HTTPSConnection(host, timeout=CONNECT_TIMEOUT)
+        pool[host] = conn
+    return conn
+
+
+def drop_connection(host: str) -> None:
+    pool: Dict[str, http.client.HTTPSConnection] = getattr(_CONNECTIONS, "pool", {})
+    conn = pool.pop(host, None)
+    if conn is not None:
+        conn.close()
+
+
 def should_ignore_api_error(exc: RuntimeError) -> bool:
     text = str(exc)
     return "404" in text or "403" in text
@@ -171,8 +449,9 @@ def should_ignore_api_error(exc: RuntimeError) -> bool:
 
 def validate_mapping(blob: bytes, kind: str) -> Dict[str, str]:
     try:
-        data = json.loads(blob.decode("utf-8"))
-    except json.JSONDecodeError as exc:
+        # json.loads 直接接受 bytes，省掉一次 decode 拷贝
+        data = json.loads(blob)
+    except ValueError as exc:
         raise RuntimeError(f"{kind} 数据不是合法 JSON: {exc}") from exc
 
     if not isinstance(data, dict):
@@ -181,15 +460,11 @@ def validate_mapping(blob: bytes, kind: str) -> Dict[str, str]:
     if len(data) < min_count:
         raise RuntimeError(f"{kind} 数据条数过少：{len(data)} < {min_count}")
 
-    normalized: Dict[str, str] = {}
-    for key, value in data.items():
-        if not isinstance(key, str):
-            raise RuntimeError(f"{kind} 数据存在非字符串键: {key!r}")
-
-        resolved = normalize_value(value)
-        if resolved == "":
-            raise RuntimeError(f"{kind} 数据值无法解析: {key!r} -> {value!r}")
-        normalized[key] = resolved
+    # JSON object 的键必然是字符串，只需校验值
+    normalized = {key: resolved for key, value in data.items() if (resolved := normalize_value(value))}
+    if len(normalized) != len(data):
+        key, value = next((k, v) for k, v in data.items() if k not in normalized)
+        raise RuntimeError(f"{kind} 数据值无法解析: {key!r} -> {value!r}")
 
     if kind == "ios" and not any(k.startswith("iPhone") for k in normalized):
         raise RuntimeError("ios 数据校验失败：缺少 iPhone 前缀 key")
@@ -207,9 +482,29 @@ def normalize_value(value: object) -> str:
     return ""
 
 
+def load_upstream_meta() -> dict:
+    try:
+        meta = json.loads(UPSTREAM_META_PATH.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+
 def write_json(path: pathlib.Path, payload: dict) -> None:
+    text = json.dumps(payload, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+    write_if_changed(path, text.encode("utf-8"))
+
+
+def write_if_changed(path: pathlib.Path, data: bytes) -> bool:
+    """内容不变时不落盘；否则先写临时文件再原子替换。返回是否写入。"""
+    if path.exists() and path.read_bytes() == data:
+        return False
+
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    return True
 
 
 def write_report(ref: str, ref_kind: str, sha: str, counts: dict) -> None:
@@ -234,22 +529,90 @@ def write_report(ref: str, ref_kind: str, sha: str, counts: dict) -> None:
     SYNC_REPORT_PATH.write_text("\n".join(lines), encoding="utf-8")
 
 
-def main() -> int:
-    args = parse_args()
-    token = os.getenv("GITHUB_TOKEN", "").strip()
-
-    ref, ref_kind, sha = resolve_upstream_ref(args, token)
+def is_up_to_date(prior_meta: dict, sha: str) -> bool:
+    if prior_meta.get("upstream_sha") != sha:
+        return False
+    counts = prior_meta.get("counts")
+    if not isinstance(counts, dict) or any(kind not in counts for kind in FILES):
+        return False
+    paths = [DATA_DIR / file_name for file_name in FILES.values()]
+    return all(path.exists() for path in [*paths, LICENSE_PATH])
+
+
+def local_path(name: str) -> pathlib.Path:
+    return LICENSE_PATH if name == "LICENSE" else DATA_DIR / name
+
+
+def sync_files(sha: str, token: str, prior_meta: dict) -> Tuple[dict, dict, dict]:
+    """按 commit sha 下载并校验上游文件，返回 (counts, etags, blobs)。"""
+    prior_etags = prior_meta.get("etags")
+    if not isinstance(prior_etags, dict):
+        prior_etags = {}
+    prior_blobs = prior_meta.get("blobs")
+    if not isinstance(prior_blobs, dict):
+        prior_blobs = {}
+
+    names = [*FILES.values(), "LICENSE"]
+    # 本地文件缺失时不能走 304 分支，只对已存在的文件带 etag
+    existing = {name for name in names if local_path(name).exists()}
+    etags = {name: str(tag) for name, tag in prior_etags.items() if name in existing}
+
+    # blob sha 未变化的文件无需下载，等同于 304
+    blobs = list_upstream_blobs(sha, token)
+    unchanged = {name for name in existing if blobs.get(name) and blobs[name] == prior_blobs.get(name)}
+    # LICENSE 几乎不变：同一 sha 下本地已有就不再请求
+    if "LICENSE" in existing and prior_meta.get("upstream_sha") == sha:
+        unchanged.add("LICENSE")
+    results: Dict[str, FetchResult] = {name: (None, etags.get(name, "")) for name in unchanged}
+    # branch/tag 的 raw URL 有 CDN 缓存，按 sha 下载才能保证内容与 upstream_sha 一致
+    results.update(download_all(sha, [name for name in names if name not in unchanged], etags))
 
     counts = {}
+    new_etags = {}
     for kind, file_name in FILES.items():
-        blob = download_raw(ref, file_name)
-        mapping = validate_mapping(blob, kind)
+        mapping, etag = results[file_name]
         out_path = DATA_DIR / file_name
-        write_json(out_path, mapping)
-        counts[kind] = len(mapping)
+        if mapping is None:
+            # 304 / blob 未变：沿用本地文件，但仍需校验；本地损坏时不带 etag 重新下载
+            try:
+                local = validate_mapping(out_path.read_bytes(), kind)
+            except (OSError, RuntimeError) as exc:
+                print(f"本地 {file_name} 校验失败，重新下载: {exc}", file=sys.stderr)
+                mapping, etag = fetch_upstream(sha, file_name, "")
+            else:
+                counts[kind] = len(local)
+        if mapping is not None:
+            write_json(out_path, mapping)
+            counts[kind] = len(mapping)
+        if etag:
+            new_etags[file_name] = etag
+
+    license_blob, license_etag = results["LICENSE"]
+    if isinstance(license_blob, bytes):
+        write_if_changed(LICENSE_PATH, license_blob)
+    if license_etag:
+        new_etags["LICENSE"] = license_etag
+
+    return counts, new_etags, blobs
+
+
+def main() -> int:
+    args = parse_args()
+    token = os.getenv("GITHUB_TOKEN", "").strip()
 
-    license_blob = download_raw(ref, "LICENSE")
-    LICENSE_PATH.write_bytes(license_blob)
+    load_api_cache()
+    ref, ref_kind, sha = resolve_upstream_ref(args, token)
+    save_api_cache()
+
+    prior_meta = load_upstream_meta()
+    if is_up_to_date(prior_meta, sha):
+        # sha 未变化：本地数据即为该 commit 的内容，只刷新同步时间
+        print(f"upstream sha 未变化，跳过下载: {sha}")
+        counts = prior_meta["counts"]
+        etags = prior_meta.get("etags", {})
+        blobs = prior_meta.get("blobs", {})
+    else:
+        counts, etags, blobs = sync_files(sha, token, prior_meta)
 
     utc_now = dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
     meta = {
@@ -258,6 +621,8 @@ def main() -> int:
         "upstream_sha": sha,
         "synced_at_utc": utc_now,
         "counts": counts,
+        "etags": etags,
+        "blobs": blobs,
     }
     write_json(UPSTREAM_META_PATH, meta)
     write_report(ref, ref_kind, sha, counts)